@@ -2,18 +2,81 @@ import streamlit as st
 import pandas as pd
 from docx import Document
 from docx.shared import Pt
+from docx.text.paragraph import Paragraph
+import copy
 import json
-from datetime import datetime
+from collections import defaultdict
+from datetime import date, datetime
 from io import BytesIO
 import re
 import html
+from html.parser import HTMLParser
+
+from document_parser import iter_text_blocks
 
 st.set_page_config(page_title="Document Generator", layout="wide")
 
+# Email fields are validated on every rerun, so compile the pattern once
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
 # ============================================================
 # HTML TO WORD FORMATTING HELPER
 # ============================================================
 
+# Matches anything that looks like a tag
+_HAS_HTML_RE = re.compile(r'<[^>]+>')
+
+class _ParagraphHTMLParser(HTMLParser):
+    """
+    Streams HTML into formatted runs on a Word paragraph.
+
+    Text is buffered until the formatting actually changes, so consecutive pieces of text with
+    the same formatting (e.g. either side of a <br> or an unsupported tag) become one run.
+    """
+
+    def __init__(self, paragraph):
+        super().__init__(convert_charrefs=True)
+        self.paragraph = paragraph
+        self.bold = False
+        self.italic = False
+        self.underline = False
+        self._pending_text = []
+        self._pending_format = (False, False, False)
+
+    def _set_tag(self, tag, is_open):
+        if tag == 'br':
+            self.handle_data('\n')
+        elif tag in ('b', 'strong'):
+            self.bold = is_open
+        elif tag in ('i', 'em'):
+            self.italic = is_open
+        elif tag == 'u':
+            self.underline = is_open
+
+    def handle_starttag(self, tag, attrs):
+        self._set_tag(tag, True)
+
+    def handle_endtag(self, tag):
+        self._set_tag(tag, False)
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags (<br/>) only open - the default would also close them
+        self._set_tag(tag, True)
+
+    def handle_data(self, data):
+        current_format = (self.bold, self.italic, self.underline)
+        if current_format != self._pending_format:
+            self.flush()
+            self._pending_format = current_format
+        self._pending_text.append(data)
+
+    def flush(self):
+        """Write any buffered text to the paragraph as a single run."""
+        if self._pending_text:
+            run = self.paragraph.add_run("".join(self._pending_text))
+            run.bold, run.italic, run.underline = self._pending_format
+            self._pending_text = []
+
 def apply_html_to_paragraph(paragraph, html_text):
     """
     Parse HTML and apply formatting to Word paragraph.
@@ -23,56 +86,218 @@ def apply_html_to_paragraph(paragraph, html_text):
     """
     paragraph.clear()
     
-    # Track current formatting state
-    is_bold = False
-    is_italic = False
-    is_underline = False
+    # A fresh parser per call - Streamlit serves each session on its own thread
+    parser = _ParagraphHTMLParser(paragraph)
+    parser.feed(html_text)
+    parser.close()
+    parser.flush()
+    
+    # if no runs were added, add the original text as-is
+    if not paragraph.runs:
+        paragraph.add_run(html.unescape(html_text))
+
+def has_html_tags(text):
+    """Check if text contains HTML tags."""
+    # Most values have no "<" at all - a plain substring check rules those out without the regex
+    return "<" in text and _HAS_HTML_RE.search(text) is not None
+
+# ============================================================
+# EXISTING DATA HELPERS
+# ============================================================
+
+def _step_into(current, part, is_last):
+    """Take one step down a JSON path, using the first item of any array along the way."""
+    if isinstance(current, dict):
+        current = current.get(part, "")
+        
+        # If this is an array and we're not at the last part, take the first item for now
+        if isinstance(current, list) and not is_last:
+            current = current[0] if current else ""
+        return current
     
-    # Pattern to match HTML tags
-    tag_pattern = r'<(/?)([a-z]+)>'
+    # If we hit an array when we expected a dict, take the first item
+    if isinstance(current, list) and current and isinstance(current[0], dict):
+        return current[0].get(part, "")
+    return ""
+
+@st.cache_data(show_spinner=False)
+def load_segment_paths(template_bytes):
+    """
+    Walk the template the same way the mapper did, so the indexes line up, and return
+    the element path of each text block's paragraph (None for a table cell without one).
+    Element paths use {namespace}tag names, so they don't depend on which prefix the
+    template binds the WordprocessingML namespace to.
+
+    Cached on the template's content, so the walk runs once per upload. Paths are
+    cached rather than the parsed document, since generating edits the document in
+    place and every run needs a fresh copy.
+    """
+    doc = Document(BytesIO(template_bytes))
+    tree = doc.element.getroottree()
+    return [
+        tree.getelementpath(block["p"]) if block["p"] is not None else None
+        for block in iter_text_blocks(doc)
+    ]
+
+def split_json_path(json_path):
+    """Split a mapping path like "section_02.participants[].name" into its keys."""
+    return tuple(json_path.replace("[]", "").split("."))
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD date, also accepting dates that aren't zero-padded (e.g. 2026-1-5)."""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+
+@st.cache_data(show_spinner=False)
+def load_mapping_config(mapping_bytes):
+    """
+    Parse the mapping config, together with the split keys of every path in it.
+    Cached on the file's content, so the paths are only split once per upload
+    instead of on every rerun.
+    """
+    mapping_config = json.loads(mapping_bytes)
+    split_paths = {json_path: split_json_path(json_path) for json_path in mapping_config}
+    return mapping_config, split_paths
+
+@st.cache_data(show_spinner=False)
+def load_field_groups(mapping_bytes):
+    """
+    List the fields of a mapping config, and the same fields grouped by section.
+    Returns (fields, [(group, fields), ...] sorted by group), once per uploaded file.
+    """
+    mapping_config, _ = load_mapping_config(mapping_bytes)
     
-    last_end = 0
-    for match in re.finditer(tag_pattern, html_text, re.IGNORECASE):
-        # Add text before this tag
-        text_before = html_text[last_end:match.start()]
-        if text_before:
-            text_before = html.unescape(text_before)
-            run = paragraph.add_run(text_before)
-            run.bold = is_bold
-            run.italic = is_italic
-            run.underline = is_underline
+    # Extract fields from mapping config
+    fields_data = []
+    for json_path, config in mapping_config.items():
+        field_name = config["field_name"]
+        field_format = config.get("format")
+        group = config.get("group", "ungrouped")
         
-        # Process the tag
-        is_closing = match.group(1) == '/'
-        tag_name = match.group(2).lower()
+        fields_data.append({
+            "path": json_path,
+            "name": field_name,
+            "format": field_format,
+            "group": group,
+            "doc_location": config.get("document_location", {})
+        })
+    
+    # Group fields by section
+    fields_by_group = defaultdict(list)
+    for field in fields_data:
+        fields_by_group[field["group"]].append(field)
+    
+    return fields_data, sorted(fields_by_group.items())
+
+def extract_values_from_data(split_paths, data):
+    """
+    Extract the value at each JSON path from nested data, handling arrays.
+    Takes {json_path: split keys} and returns {json_path: value as a string},
+    with "" for anything missing.
+
+    Mapping paths share long prefixes (section_02.participants[].name, ...email_address, ...),
+    so the node reached at each prefix is remembered and each shared prefix is only walked once.
+    """
+    nodes = {(): data}
+    values = {}
+    
+    for json_path, parts in split_paths.items():
+        # Resume from the longest prefix that's already been walked
+        depth = len(parts) - 1
+        while parts[:depth] not in nodes:
+            depth -= 1
+        current = nodes[parts[:depth]]
         
-        if tag_name == 'br':
-            paragraph.add_run('\n')
-        elif tag_name in ['b', 'strong']:
-            is_bold = not is_closing
-        elif tag_name in ['i', 'em']:
-            is_italic = not is_closing
-        elif tag_name == 'u':
-            is_underline = not is_closing
+        for i in range(depth, len(parts) - 1):
+            current = _step_into(current, parts[i], is_last=False)
+            nodes[parts[:i + 1]] = current
         
-        last_end = match.end()
+        value = _step_into(current, parts[-1], is_last=True)
+        values[json_path] = str(value) if value else ""
     
-    # add remaining text after last tag
-    text_after = html_text[last_end:]
-    if text_after:
-        text_after = html.unescape(text_after)
-        run = paragraph.add_run(text_after)
-        run.bold = is_bold
-        run.italic = is_italic
-        run.underline = is_underline
+    return values
+
+# ============================================================
+# FIELD EDITORS
+# ============================================================
+
+@st.fragment
+def render_group_fields(fields, show_previews):
+    """
+    Render the inputs for one group of fields, keeping field_values in sync.
+    With show_previews, text fields containing HTML also get a rendered preview.
+
+    Runs as a fragment, so typing in a field only reruns its own group's tab
+    instead of the whole app.
+    """
+    field_values = st.session_state.field_values
+    invalid_emails = []
     
-    # if no runs were added, add the original text as-is
-    if not paragraph.runs:
-        paragraph.add_run(html.unescape(html_text))
+    for field in fields:
+        path = field["path"]
+        field_format = field["format"]
+        current_value = field_values.get(path, "")
+        
+        # Create input based on format
+        if field_format == "date":
+            # Date picker
+            label = f"📅 {path}"
+            try:
+                # Try to parse existing date
+                if current_value:
+                    default_date = parse_date(current_value)
+                else:
+                    default_date = date.today()
+            except:
+                default_date = date.today()
+            
+            date_value = st.date_input(
+                label,
+                value=default_date,
+                key=f"date_{path}"
+            )
+            field_values[path] = date_value.strftime("%Y-%m-%d")
+        
+        elif field_format == "email":
+            # Email input with validation
+            label = f"📧 {path}"
+            email_value = st.text_input(
+                label,
+                value=current_value,
+                key=f"email_{path}",
+                placeholder="user@example.com"
+            )
+            
+            # Validate email - invalid ones are reported together below the group
+            if email_value:
+                if not _EMAIL_RE.match(email_value):
+                    invalid_emails.append(path)
+            
+            field_values[path] = email_value
+        
+        else:
+            # Regular text input - use text_area for HTML support
+            text_value = st.text_area(
+                path,
+                value=current_value,
+                key=f"text_{path}",
+                height=100,
+                help="Supports HTML: <b>bold</b>, <i>italic</i>, <u>underline</u>, <br> for line break"
+            )
+            field_values[path] = text_value
+            
+            # Show HTML preview if HTML tags detected
+            if show_previews and text_value and has_html_tags(text_value):
+                st.caption("🎨 HTML detected - will apply formatting")
+                # Show a preview of how it will render
+                preview_html = text_value.replace('<br>', '<br/>')
+                st.markdown(f"Preview: {preview_html}", unsafe_allow_html=True)
+    
+    if invalid_emails:
+        st.warning("⚠️ Invalid email format in: " + ", ".join(invalid_emails))
 
-def has_html_tags(text):
-    """Check if text contains HTML tags."""
-    return bool(re.search(r'<[^>]+>', text))
 
 st.title("📄 Document Generator")
 st.markdown("Upload your template, mapping config, and optionally existing data - then fill in or edit the values to generate your document.")
@@ -94,8 +319,9 @@ with col3:
 
 if template_file and mapping_file:
     # Load files
-    doc = Document(template_file)
-    mapping_config = json.load(mapping_file)
+    template_bytes = template_file.getvalue()
+    mapping_bytes = mapping_file.getvalue()
+    mapping_config, split_paths = load_mapping_config(mapping_bytes)
     
     # Load existing data if provided
     existing_data = {}
@@ -107,66 +333,8 @@ if template_file and mapping_file:
     
     st.markdown("---")
     
-    # Helper function to extract value from nested JSON with array support
-    def extract_value_from_data(json_path, data):
-        """Extract value from nested data structure, handling arrays."""
-        # Handle array notation
-        has_array = "[]" in json_path
-        path_parts = json_path.replace("[]", "").split(".")
-        
-        current = data
-        for i, part in enumerate(path_parts):
-            if not isinstance(current, dict):
-                # If we hit an array when we expected a dict
-                if isinstance(current, list) and len(current) > 0:
-                    # For array fields, take the first item as default
-                    current = current[0]
-                    if isinstance(current, dict):
-                        current = current.get(part, "")
-                    else:
-                        return ""
-                else:
-                    return ""
-            else:
-                current = current.get(part, "")
-                
-                # If this is an array and we're not at the last part
-                if isinstance(current, list) and i < len(path_parts) - 1:
-                    if len(current) > 0:
-                        # Take first item for now
-                        current = current[0]
-                    else:
-                        return ""
-        
-        return current if current else ""
-    
-    # Extract fields from mapping config
-    fields_data = []
-    for json_path, config in mapping_config.items():
-        field_name = config["field_name"]
-        field_format = config.get("format")
-        group = config.get("group", "ungrouped")
-        
-        # Get existing value if available
-        existing_value = extract_value_from_data(json_path, existing_data)
-        
-        if not existing_value:
-            existing_value = ""
-        
-        fields_data.append({
-            "path": json_path,
-            "name": field_name,
-            "format": field_format,
-            "group": group,
-            "value": str(existing_value),
-            "doc_location": config.get("document_location", {})
-        })
-    
-    # Group fields by section
-    fields_by_group = {}
-    for field in fields_data:
-        grp = field["group"]
-        fields_by_group.setdefault(grp, []).append(field)
+    # Fields and their groups (cached - they only depend on the mapping config)
+    fields_data, sorted_groups = load_field_groups(mapping_bytes)
     
     # Display form for each group
     st.subheader("📝 Enter/Edit Data")
@@ -201,10 +369,17 @@ if template_file and mapping_file:
     if data_changed:
         st.session_state.last_data_file = data_file_name
         
+        # Existing values are only needed when the data changes, not on every rerun.
+        # With the data file removed there is nothing to walk - every field is cleared
+        if existing_data:
+            existing_values = extract_values_from_data(split_paths, existing_data)
+        else:
+            existing_values = dict.fromkeys(split_paths, "")
+        
         # Update our tracking dict AND the widget state keys
         for field in fields_data:
             path = field["path"]
-            value = field["value"]
+            value = existing_values[path]
             field_format = field.get("format")
             
             # Store in our tracking
@@ -215,108 +390,50 @@ if template_file and mapping_file:
                 # For dates, parse and store as date object
                 if value:
                     try:
-                        st.session_state[f"date_{path}"] = datetime.strptime(value, "%Y-%m-%d").date()
+                        st.session_state[f"date_{path}"] = parse_date(value)
                     except:
-                        st.session_state[f"date_{path}"] = datetime.now().date()
+                        st.session_state[f"date_{path}"] = date.today()
             elif field_format == "email":
                 st.session_state[f"email_{path}"] = value
             else:
                 st.session_state[f"text_{path}"] = value
         
         if data_file_name:
-            filled_count = len([f for f in fields_data if f['value']])
+            filled_count = len([v for v in existing_values.values() if v])
             st.info(f"📥 Pre-filled {filled_count} / {len(fields_data)} fields from {data_file_name}")
             
             # Show which fields were filled
             with st.expander("🔍 View Pre-filled Fields"):
-                for field in fields_data:
-                    if field['value']:
-                        value_preview = field['value'][:50] + "..." if len(field['value']) > 50 else field['value']
-                        st.text(f"✓ {field['path']}: {value_preview}")
+                for path, value in existing_values.items():
+                    if value:
+                        value_preview = value[:50] + "..." if len(value) > 50 else value
+                        st.text(f"✓ {path}: {value_preview}")
     
     # Create tabs for each group
-    group_tabs = st.tabs([f"📁 {grp}" for grp in sorted(fields_by_group.keys())])
+    # Rendered previews cost a markdown element per HTML field on every rerun, so they're opt-in
+    show_previews = st.checkbox("Show HTML previews", value=False, key="show_html_previews")
+    
+    group_tabs = st.tabs([f"📁 {grp}" for grp, _ in sorted_groups])
     
-    for tab, (group_name, fields) in zip(group_tabs, sorted(fields_by_group.items())):
+    for tab, (group_name, fields) in zip(group_tabs, sorted_groups):
         with tab:
-            for field in fields:
-                path = field["path"]
-                name = field["name"]
-                field_format = field["format"]
-                current_value = st.session_state.field_values.get(path, "")
-                
-                # Create input based on format
-                if field_format == "date":
-                    # Date picker
-                    label = f"📅 {path}"
-                    try:
-                        # Try to parse existing date
-                        if current_value:
-                            default_date = datetime.strptime(current_value, "%Y-%m-%d").date()
-                        else:
-                            default_date = datetime.now().date()
-                    except:
-                        default_date = datetime.now().date()
-                    
-                    date_value = st.date_input(
-                        label,
-                        value=default_date,
-                        key=f"date_{path}"
-                    )
-                    st.session_state.field_values[path] = date_value.strftime("%Y-%m-%d")
-                
-                elif field_format == "email":
-                    # Email input with validation
-                    label = f"📧 {path}"
-                    email_value = st.text_input(
-                        label,
-                        value=current_value,
-                        key=f"email_{path}",
-                        placeholder="user@example.com"
-                    )
-                    
-                    # Validate email
-                    if email_value:
-                        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-                        if not re.match(email_pattern, email_value):
-                            st.warning("⚠️ Invalid email format")
-                    
-                    st.session_state.field_values[path] = email_value
-                
-                else:
-                    # Regular text input - use text_area for HTML support
-                    text_value = st.text_area(
-                        path,
-                        value=current_value,
-                        key=f"text_{path}",
-                        height=100,
-                        help="Supports HTML: <b>bold</b>, <i>italic</i>, <u>underline</u>, <br> for line break"
-                    )
-                    st.session_state.field_values[path] = text_value
-                    
-                    # Show HTML preview if HTML tags detected
-                    if text_value and has_html_tags(text_value):
-                        st.caption("🎨 HTML detected - will apply formatting")
-                        # Show a preview of how it will render
-                        preview_html = text_value.replace('<br>', '<br/>')
-                        st.markdown(f"Preview: {preview_html}", unsafe_allow_html=True)
+            render_group_fields(fields, show_previews)
     
     # Show data preview
     st.markdown("---")
     
+    # Build the nested JSON structure once - both the preview and Generate use it
+    output_json = {}
+    for path, value in st.session_state.field_values.items():
+        if value:  # Only include non-empty values
+            # field_values can still hold paths from a previously uploaded mapping
+            parts = split_paths.get(path) or split_json_path(path)
+            current = output_json
+            for part in parts[:-1]:
+                current = current.setdefault(part, {})
+            current[parts[-1]] = value
+    
     with st.expander("🔍 Preview JSON Data"):
-        # Build the nested JSON structure
-        output_json = {}
-        for path, value in st.session_state.field_values.items():
-            if value:  # Only include non-empty values
-                parts = path.replace("[]", "").split(".")
-                current = output_json
-                for part in parts[:-1]:
-                    if part not in current:
-                        current[part] = {}
-                    current = current[part]
-                current[parts[-1]] = value
-        
         st.json(output_json)
     
     # Generate document
@@ -325,100 +442,73 @@ if template_file and mapping_file:
     
     with col1:
         if st.button("🚀 Generate Document", type="primary"):
-            # Build the nested JSON
-            output_json = {}
-            for path, value in st.session_state.field_values.items():
-                if value:
-                    parts = path.replace("[]", "").split(".")
-                    current = output_json
-                    for part in parts[:-1]:
-                        if part not in current:
-                            current[part] = {}
-                        current = current[part]
-                    current[parts[-1]] = value
-            
-            # Apply values to document
-            # Parse document to get all text segments (reusing logic from mapper)
-            from docx.oxml.table import CT_Tbl
-            from docx.oxml.text.paragraph import CT_P
-            from docx.table import Table
-            from docx.text.paragraph import Paragraph
-            
-            segments = []
-            for child in doc.element.body:
-                if isinstance(child, CT_P):
-                    para = Paragraph(child, doc)
-                    if para.text.strip():
-                        segments.append({"type": "paragraph", "obj": para})
-                elif isinstance(child, CT_Tbl):
-                    table = Table(child, doc)
-                    seen_in_row = {}
-                    for row_idx, row in enumerate(table.rows):
-                        if row_idx not in seen_in_row:
-                            seen_in_row[row_idx] = set()
-                        for cell in row.cells:
-                            text = cell.text.strip()
-                            if text and text not in seen_in_row[row_idx]:
-                                seen_in_row[row_idx].add(text)
-                                if cell.paragraphs:
-                                    segments.append({"type": "cell", "obj": cell.paragraphs[0]})
+            # Apply values to a fresh copy of the template - the edits below change it in place
+            doc = Document(BytesIO(template_bytes))
+            doc_tree = doc.element.getroottree()
+            segment_paths = load_segment_paths(template_bytes)
             
             # Apply mappings
             updated_count = 0
             debug_info = []
             
+            # Bucket the writes by segment first. When several fields map to the same place
+            # only the last one ends up in the document, so don't write the others just to
+            # overwrite them
+            segment_writes = {}
+            fields_per_segment = defaultdict(int)
             for path, value in st.session_state.field_values.items():
                 if value and path in mapping_config:
-                    doc_loc = mapping_config[path]["document_location"]
-                    idx = doc_loc["index"]
+                    idx = mapping_config[path]["document_location"]["index"]
+                    if idx in segment_writes:
+                        debug_info.append(f"⏭️ Skipped {segment_writes[idx][0]}: {path} is mapped to the same location")
+                    segment_writes[idx] = (path, value)
+                    fields_per_segment[idx] += 1
+            
+            for idx, (path, value) in segment_writes.items():
+                if idx < len(segment_paths) and segment_paths[idx] is not None:
+                    para = Paragraph(doc_tree.find(segment_paths[idx]), doc)
                     
-                    if idx < len(segments):
-                        para = segments[idx]["obj"]
-                        
-                        # Preserve original formatting attributes
-                        original_font_name = None
-                        original_font_size = None
-                        if para.runs:
-                            first_run = para.runs[0]
-                            original_font_name = first_run.font.name
-                            original_font_size = first_run.font.size
-                        
-                        # Check if value contains HTML tags
-                        value_str = str(value)
-                        has_html = has_html_tags(value_str)
+                    # Preserve original formatting attributes
+                    original_font_name = None
+                    original_font_size = None
+                    first_run = para.runs[0] if para.runs else None
+                    if first_run is not None:
+                        original_font_name = first_run.font.name
+                        original_font_size = first_run.font.size
+                    
+                    # Check if value contains HTML tags
+                    value_str = str(value)
+                    has_html = has_html_tags(value_str)
+                    
+                    if has_html:
+                        # Apply HTML formatting
+                        debug_info.append(f"🎨 Applied HTML to {path}: {value_str[:50]}...")
+                        apply_html_to_paragraph(para, value_str)
                         
-                        if has_html:
-                            # Apply HTML formatting
-                            debug_info.append(f"🎨 Applied HTML to {path}: {value_str[:50]}...")
-                            apply_html_to_paragraph(para, value_str)
-                            
-                            # Reapply original font properties to all runs
-                            if original_font_name or original_font_size:
-                                for run in para.runs:
-                                    if original_font_name:
-                                        run.font.name = original_font_name
-                                    if original_font_size:
-                                        run.font.size = original_font_size
-                        else:
-                            # Plain text - preserve formatting
-                            debug_info.append(f"📝 Applied plain text to {path}: {value_str[:50]}...")
-                            if para.runs:
-                                first_run = para.runs[0]
-                                bold = first_run.bold
-                                italic = first_run.italic
-                                
-                                para.clear()
-                                run = para.add_run(value_str)
-                                run.bold = bold
-                                run.italic = italic
+                        # Reapply original font properties to all runs
+                        if original_font_name or original_font_size:
+                            for run in para.runs:
                                 if original_font_name:
                                     run.font.name = original_font_name
                                 if original_font_size:
                                     run.font.size = original_font_size
-                            else:
-                                para.text = value_str
-                        
-                        updated_count += 1
+                    else:
+                        # Plain text - preserve formatting
+                        debug_info.append(f"📝 Applied plain text to {path}: {value_str[:50]}...")
+                        if first_run is not None:
+                            # Carry the first run's formatting over as a copy of its <w:rPr>,
+                            # rather than reading and re-applying each property
+                            rpr = first_run._r.rPr
+                            
+                            para.clear()
+                            run = para.add_run(value_str)
+                            if rpr is not None:
+                                run._r.insert(0, copy.deepcopy(rpr))
+                        else:
+                            para.text = value_str
+                    
+                    # Count the overwritten fields too - the banner counts fields, not locations
+                    updated_count += fields_per_segment[idx]
             
             st.success(f"✅ Generated document! Updated {updated_count} fields.")
             
@@ -0,0 +1,158 @@
+"""
+Shared helpers for walking the body of a Word document.
+
+Both apps need the exact same ordered list of text blocks - the mapping config refers to
+blocks by their index - so the walk lives here rather than being duplicated in each app.
+
+Tables are read straight from the XML (<w:tr> / <w:tc>) rather than through python-docx's
+Table.rows / row.cells, which rebuild the whole cell grid on every access and get very slow
+on large tables.
+"""
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.ns import nsmap, qn
+from docx.oxml.table import CT_Tbl
+from docx.oxml.text.paragraph import CT_P
+from lxml import etree
+
+
+# Run content that contributes to a paragraph's text, in document order. Compiled once,
+# since it's evaluated for every paragraph and table cell in the document.
+_RUN_CONTENT = etree.XPath(
+    "(./w:r | ./w:hyperlink/w:r)/*[self::w:t or self::w:tab or self::w:ptab or self::w:br or self::w:cr or self::w:noBreakHyphen]",
+    namespaces={"w": nsmap["w"]},
+)
+_T = qn("w:t")
+_BR = qn("w:br")
+_BR_TYPE = qn("w:type")
+_TR_PR = qn("w:trPr")
+_GRID_BEFORE = qn("w:gridBefore")
+_VAL = qn("w:val")
+_RUN_CHARS = {qn("w:tab"): "\t", qn("w:ptab"): "\t", qn("w:cr"): "\n", qn("w:noBreakHyphen"): "-"}
+
+
+def paragraph_text(p):
+    """
+    Text of a <w:p>, read straight from the XML.
+
+    Gives the same result as python-docx's paragraph.text, without building a Run object
+    for every run in the paragraph.
+    """
+    parts = []
+    for node in _RUN_CONTENT(p):
+        tag = node.tag
+        if tag == _T:
+            parts.append(node.text or "")
+        elif tag == _BR:
+            # Page and column breaks don't show up as text
+            if node.get(_BR_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        else:
+            parts.append(_RUN_CHARS[tag])
+    return "".join(parts)
+
+
+def cell_text(tc):
+    """Text of a <w:tc>, one line per paragraph (same as python-docx's cell.text)."""
+    return "\n".join(paragraph_text(p) for p in tc.p_lst)
+
+
+def _grid_before(tr):
+    """Number of empty grid columns before the first cell of a <w:tr> (w:trPr/w:gridBefore)."""
+    trPr = tr.find(_TR_PR)
+    grid_before = trPr.find(_GRID_BEFORE) if trPr is not None else None
+    return int(grid_before.get(_VAL, 0)) if grid_before is not None else 0
+
+
+def table_rows(tbl):
+    """
+    Return the cells of each row of a <w:tbl> as raw <w:tc> elements.
+
+    This mirrors python-docx's row.cells: a horizontally merged cell is repeated for every
+    grid column it spans, and a vertically merged "continue" cell is replaced by the cell
+    above it in the same grid column. Grid columns count the empty columns a row can start
+    with (w:gridBefore), which aren't part of the row's cells.
+    """
+    rows = []
+    above = {}
+    for tr in tbl.tr_lst:
+        cells = []
+        by_grid_col = {}
+        grid_col = _grid_before(tr)
+        for tc in tr.tc_lst:
+            is_continuation = tc.vMerge == "continue"
+            for _ in range(tc.grid_span):
+                cell = above.get(grid_col, tc) if is_continuation else tc
+                cells.append(cell)
+                by_grid_col[grid_col] = cell
+                grid_col += 1
+        rows.append(cells)
+        above = by_grid_col
+    return rows
+
+
+def paragraph_style_names(doc):
+    """
+    Map every paragraph style id in the document to its name.
+
+    None (no w:pStyle) maps to the default paragraph style's name, like python-docx's
+    paragraph.style does. Resolving the style through python-docx searches styles.xml again
+    for every paragraph; with this lookup built once, the walk only reads the raw style id.
+    """
+    default_style = doc.styles.default(WD_STYLE_TYPE.PARAGRAPH)
+    style_names = {None: default_style.name if default_style is not None else ""}
+    for style in doc.styles:
+        if style.type == WD_STYLE_TYPE.PARAGRAPH:
+            style_names[style.style_id] = style.name
+    return style_names
+
+
+def iter_text_blocks(doc):
+    """
+    Yield every non-blank text block of the document body, in document order.
+
+    Each block is a dict with "type" ("paragraph" or "table_cell"), the stripped "text" and
+    the <w:p> element that holds it as "p" (for table cells, the cell's first paragraph).
+    Paragraphs also carry their "style" name, and table cells their "row" and "col" index.
+
+    Blocks hold raw elements rather than python-docx Paragraphs - wrap them with
+    Paragraph(block["p"], doc) only where the runs are actually needed.
+
+    Merged cells, and any text repeated within a table row, are only yielded once per row,
+    but the same text in different rows is kept.
+    """
+    style_names = paragraph_style_names(doc)
+    default_style_name = style_names[None]
+    
+    for child in doc.element.body:
+        if isinstance(child, CT_P):
+            text = paragraph_text(child).strip()
+            if text:
+                yield {
+                    "type": "paragraph",
+                    "text": text,
+                    "p": child,
+                    "style": style_names.get(child.style, default_style_name),
+                }
+
+        elif isinstance(child, CT_Tbl):
+            for row_idx, cells in enumerate(table_rows(child)):
+                seen_in_row = set()
+                seen_tcs = set()
+                for cell_idx, tc in enumerate(cells):
+                    # A merged cell shows up once per grid column it spans, always as the
+                    # same <w:tc> - skip the repeats before working out their text
+                    if id(tc) in seen_tcs:
+                        continue
+                    seen_tcs.add(id(tc))
+                    
+                    text = cell_text(tc).strip()
+                    if not text or text in seen_in_row:
+                        continue
+                    seen_in_row.add(text)
+                    yield {
+                        "type": "table_cell",
+                        "text": text,
+                        "p": tc.p_lst[0] if tc.p_lst else None,
+                        "row": row_idx,
+                        "col": cell_idx,
+                    }
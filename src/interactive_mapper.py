@@ -1,13 +1,11 @@
 import streamlit as st
 import pandas as pd
 from docx import Document
+from io import BytesIO
+import html
 import json
-import re
 
-from docx.oxml.table import CT_Tbl
-from docx.oxml.text.paragraph import CT_P
-from docx.table import Table
-from docx.text.paragraph import Paragraph
+from document_parser import iter_text_blocks
 
 st.set_page_config(page_title="JSON to Document Mapper", layout="wide")
 
@@ -15,6 +13,22 @@ st.set_page_config(page_title="JSON to Document Mapper", layout="wide")
 # HELPER FUNCTIONS
 # ============================================================
 
+# Icon shown next to each kind of text block in the document preview
+TYPE_EMOJI = {"heading": "📌", "table_header": "📊", "table_cell": "📋", "paragraph": "📝"}
+
+# Markup for one text block in the document preview, filled in with % for every block:
+# background, border colour, index, icon, text, mapped label
+PREVIEW_BLOCK_HTML = """
+            <div style='padding: 12px; margin: 6px 0; background: %s; 
+                       border-left: 4px solid %s; border-radius: 4px;
+                       font-size: 14px; font-weight: normal;
+                       content-visibility: auto; contain-intrinsic-size: auto 48px;'>
+                <span style='color: #6c757d; font-size: 11px;'>[%03d] %s</span> %s
+                %s
+            </div>
+            """
+PREVIEW_MAPPED_LABEL_HTML = '<div style="color: #155724; font-size: 11px; margin-top: 4px;">✓ Will be replaced by: <b>%s</b></div>'
+
 def resolve_schema_ref(root_schema, ref_path):
     """Resolve a $ref path in JSON schema."""
     if not ref_path.startswith("#/"):
@@ -29,65 +43,102 @@ def resolve_schema_ref(root_schema, ref_path):
             return None
     return current
 
+def _resolve_ref_cached(root_schema, ref_path, resolved_refs):
+    """resolve_schema_ref, memoized in resolved_refs for the duration of one schema walk."""
+    if ref_path not in resolved_refs:
+        resolved_refs[ref_path] = resolve_schema_ref(root_schema, ref_path)
+    return resolved_refs[ref_path]
+
+def _push_object(stack, schema_data, prefix, section, group):
+    """Queue an object schema's properties to be walked by extract_json_fields."""
+    if not isinstance(schema_data, dict):
+        return
+    
+    # Nothing to walk - don't bother building the required set
+    properties = schema_data.get("properties")
+    if not properties:
+        return
+    
+    required_set = frozenset(schema_data.get("required") or ())
+    include_all = len(required_set) == 0
+    stack.append((iter(properties.items()), required_set, include_all, prefix, section, group))
+
 def extract_json_fields(schema_data, prefix="", section="", root=None, group=None):
-    """Extract all required fields from JSON schema."""
+    """
+    Extract all required fields from JSON schema.
+
+    Walks the schema with an explicit stack of property iterators instead of recursing,
+    so deep/large schemas don't pay a Python call per nested object. A nested object is
+    walked as soon as it's reached, so fields come out in the same depth-first order as
+    they appear in the schema.
+    """
     if root is None:
         root = schema_data
-    if not isinstance(schema_data, dict):
-        return []
     
     fields = []
-    required_set = set(schema_data.get("required", []))
-    include_all = len(required_set) == 0
+    stack = []
+    _push_object(stack, schema_data, prefix, section, group)
     
+    # The same few definitions tend to be referenced over and over (e.g. a shared
+    # Personnel object) - resolve each $ref path once
+    resolved_refs = {}
 
     # Presumably, properties is where the fields we are about to extract are defined.
     # So to add more fields, we just need to add them to the properties section.
     # Some work is required to extract all the fields from the def section, which is why this is so long...
 
-    if "properties" in schema_data:
-        for k, v in schema_data["properties"].items():
-            if not include_all and k not in required_set:
-                continue
-            
-            path = f"{prefix}.{k}" if prefix else k
-            current_section = k if k.startswith("section_") else section
-            current_group = group or k
-            
-            # Handle anyOf/allOf/oneOf
-            combo = v.get("anyOf") or v.get("allOf") or v.get("oneOf")
-            if combo:
-                for option in combo:
-                    if option.get("type") == "null":
-                        continue
-                    if "$ref" in option:
-                        ref = resolve_schema_ref(root, option["$ref"])
-                        if ref:
-                            fields += extract_json_fields(ref, path, current_section, root, current_group)
-                continue
-            
-            if "$ref" in v:
-                ref = resolve_schema_ref(root, v["$ref"])
-                if ref:
-                    fields += extract_json_fields(ref, path, current_section, root, current_group)
-            elif v.get("type") == "object":
-                fields += extract_json_fields(v, path, current_section, root, current_group)
-            elif v.get("type") == "array":
-                items = v.get("items")
-                if isinstance(items, dict) and "$ref" in items:
-                    ref = resolve_schema_ref(root, items["$ref"])
-                    if ref:
-                        fields += extract_json_fields(ref, f"{path}[]", current_section, root, current_group)
-            else:
-                # Leaf field
-                fields.append({
-                    "path": path,
-                    "field_name": k,
-                    "section": current_section,
-                    "group": current_group,
-                    "type": v.get("type", "unknown"),
-                    "format": v.get("format")  # Add format attribute (date, email, etc.)
-                })
+    while stack:
+        properties, required_set, include_all, prefix, section, group = stack[-1]
+        item = next(properties, None)
+        if item is None:
+            stack.pop()
+            continue
+        
+        k, v = item
+        if not include_all and k not in required_set:
+            continue
+        
+        path = f"{prefix}.{k}" if prefix else k
+        current_section = k if k.startswith("section_") else section
+        current_group = group or k
+        
+        # Collect the nested object schemas (if any) this property expands into
+        children = []
+        child_prefix = path
+        
+        # Handle anyOf/allOf/oneOf
+        combo = v.get("anyOf") or v.get("allOf") or v.get("oneOf")
+        if combo:
+            for option in combo:
+                if option.get("type") == "null":
+                    continue
+                if "$ref" in option:
+                    children.append(_resolve_ref_cached(root, option["$ref"], resolved_refs))
+        elif "$ref" in v:
+            children.append(_resolve_ref_cached(root, v["$ref"], resolved_refs))
+        elif v.get("type") == "object":
+            children.append(v)
+        elif v.get("type") == "array":
+            items = v.get("items")
+            if isinstance(items, dict) and "$ref" in items:
+                children.append(_resolve_ref_cached(root, items["$ref"], resolved_refs))
+                child_prefix = f"{path}[]"
+        else:
+            # Leaf field
+            fields.append({
+                "path": path,
+                "field_name": k,
+                "section": current_section,
+                "group": current_group,
+                "type": v.get("type", "unknown"),
+                "format": v.get("format")  # Add format attribute (date, email, etc.)
+            })
+            continue
+        
+        # Push in reverse so the first option is walked first
+        for child in reversed(children):
+            if child:
+                _push_object(stack, child, child_prefix, current_section, current_group)
     
     return fields
 
@@ -105,15 +156,13 @@ def parse_word_document(doc):
     segments = []
     current_section = None
     
-    for child in doc.element.body:
-        if isinstance(child, CT_P):
-            para = Paragraph(child, doc)
-            text = para.text.strip()
-            if not text:
-                continue
-            
-            style = para.style.name if para.style else ""
-            is_heading = style.lower().startswith("heading")
+    for block in iter_text_blocks(doc):
+        text = block["text"]
+        
+        if block["type"] == "paragraph":
+            style = block["style"]
+            # Only the first 7 characters matter - no need to lowercase the whole name
+            is_heading = style[:7].lower() == "heading"
             
             # Update current section when we encounter a heading
             if is_heading:
@@ -126,42 +175,96 @@ def parse_word_document(doc):
                 "style": style
             })
         
-        elif isinstance(child, CT_Tbl):
-            table = Table(child, doc)
-            
-            # Track unique text in each row to avoid merged cell duplicates
-            # but keep the same text if it appears in different rows
+        else:
+            # Merged cells are only reported once per row by iter_text_blocks
+            # (python-docx repeats them), but the same text in different rows is kept.
+            is_header = block["row"] == 0
+            segments.append({
+                "text": text,
+                "type": "table_header" if is_header else "table_cell",
+                "section": current_section,
+                "style": f"Table[{block['row']},{block['col']}]"
+            })
+    
+    return segments
+
+@st.cache_data(show_spinner=False)
+def load_document_segments(doc_bytes):
+    """
+    Parse an uploaded Word document into text segments, once per unique file.
+
+    Streamlit re-runs the whole script on every interaction (dropdown change, button click),
+    so without this the document would be re-parsed every time. Keyed on the file's bytes.
+    """
+    return parse_word_document(Document(BytesIO(doc_bytes)))
 
-            # why? issues with pulling data using docx library, which gave some duplicate text
+@st.cache_data(show_spinner=False)
+def load_text_options(doc_bytes):
+    """
+    Build the dropdown labels for an uploaded document's text blocks.
+    Like the segments themselves, these only change when a different document is uploaded.
+    """
+    text_options = ["(Not Mapped)"]
     
-            seen_in_row = {}
-            
-            for row_idx, row in enumerate(table.rows):
-                # Reset for each row
-                if row_idx not in seen_in_row:
-                    seen_in_row[row_idx] = set()
-                
-                for cell_idx, cell in enumerate(row.cells):
-                    text = cell.text.strip()
-                    if text:
-                        # Create a unique key for this text + row
-                        cell_key = (row_idx, text)
-                        
-                        # Skip if we've seen this exact text in this row (merged cell)
-                        if text in seen_in_row[row_idx]:
-                            continue
-                        
-                        seen_in_row[row_idx].add(text)
-                        
-                        is_header = row_idx == 0
-                        segments.append({
-                            "text": text,
-                            "type": "table_header" if is_header else "table_cell",
-                            "section": current_section,
-                            "style": f"Table[{row_idx},{cell_idx}]"
-                        })
+    for idx, seg in enumerate(load_document_segments(doc_bytes)):
+        # Simpler format: just ID and text (no icons)
+        text_preview = seg["text"][:60] + "..." if len(seg["text"]) > 60 else seg["text"]
+        text_options.append(f"{idx:03d} | {text_preview}")
     
-    return segments
+    return text_options
+
+def segment_index_from_label(label, text_options):
+    """
+    Get the segment index a dropdown label points to, or None if it isn't a current option.
+
+    Labels start with the segment index ("007 | ..."), so no separate lookup is needed. The
+    label is still compared with the option at that index, so a stale one left over from a
+    previously uploaded document doesn't match.
+    """
+    idx_text, sep, _ = label.partition(" | ")
+    if not sep or not idx_text.isdigit():
+        return None
+    idx = int(idx_text)
+    if idx + 1 < len(text_options) and text_options[idx + 1] == label:
+        return idx
+    return None
+
+@st.cache_data(show_spinner=False)
+def load_json_fields(schema_bytes):
+    """Extract the JSON fields from an uploaded schema, once per unique file."""
+    return extract_json_fields(json.loads(schema_bytes))
+
+@st.cache_data(show_spinner=False)
+def load_fields_table(schema_bytes):
+    """
+    Build the mapping table for an uploaded schema: one row per JSON field, all unmapped.
+    Cached like the fields themselves - each rerun gets its own copy to fill in.
+    """
+    df_data = []
+    for field in load_json_fields(schema_bytes):
+        # Show full path with format hint
+        field_display = field["path"]
+        if field.get("format"):
+            if field["format"] == "date":
+                field_display += " 📅"
+            elif field["format"] == "email":
+                field_display += " 📧"
+        
+        df_data.append({
+            "JSON Field": field_display,
+            "Full Path": field["path"],
+            "Group": field["group"],
+            "Type": field["type"],
+            "Format": field.get("format") or "",
+            "Mapped To": "(Not Mapped)"
+        })
+    
+    # Every column is text - give pandas the columns and dtype up front instead of
+    # having it infer them from the list of dicts. Group and Type only take a handful of
+    # distinct values, so they're stored as categories.
+    df_columns = ["JSON Field", "Full Path", "Group", "Type", "Format", "Mapped To"]
+    df = pd.DataFrame.from_records(df_data, columns=df_columns).astype("string")
+    return df.astype({"Group": "category", "Type": "category"})
 
 # ============================================================
 # MAIN APP
@@ -189,104 +292,56 @@ with col2:
     schema_file = st.file_uploader("📋 Upload JSON Schema", type="json")
 
 if doc_file and schema_file:
-    # Load schema
-    schema_data = json.load(schema_file)
-    json_fields = extract_json_fields(schema_data)
-    
-    # Group JSON fields
-    fields_by_group = {}
-    for field in json_fields:
-        group = field.get("group", "other")
-        fields_by_group.setdefault(group, []).append(field)
+    # Load schema (cached across reruns)
+    schema_bytes = schema_file.getvalue()
+    json_fields = load_json_fields(schema_bytes)
     
-    # Parse document
-    doc = Document(doc_file)
-    segments = parse_word_document(doc)
+    # Parse document (cached across reruns)
+    doc_bytes = doc_file.getvalue()
+    segments = load_document_segments(doc_bytes)
     
     st.success(f"✓ Found {len(segments)} text blocks and {len(json_fields)} JSON fields")
     
-    # Create text block options for dropdowns with better formatting
-    text_options = ["(Not Mapped)"]
-    text_lookup = {}
-    
-    for idx, seg in enumerate(segments):
-        # Simpler format: just ID and text (no icons)
-        text_preview = seg["text"][:60] + "..." if len(seg["text"]) > 60 else seg["text"]
-        label = f"{idx:03d} | {text_preview}"
-        text_options.append(label)
-        text_lookup[label] = {
-            "index": idx,
-            "text": seg["text"],
-            "type": seg["type"],
-            "section": seg["section"]
-        }
-    
-    # Create DataFrame with JSON fields to map
-    df_data = []
-    for field in json_fields:
-        # Show full path with format hint
-        field_display = field["path"]
-        if field.get("format"):
-            if field["format"] == "date":
-                field_display += " 📅"
-            elif field["format"] == "email":
-                field_display += " 📧"
-        
-        df_data.append({
-            "JSON Field": field_display,
-            "Full Path": field["path"],
-            "Group": field["group"],
-            "Type": field["type"],
-            "Format": field.get("format", ""),
-            "Mapped To": "(Not Mapped)"
-        })
+    # Text block options for dropdowns (cached - they only depend on the document)
+    text_options = load_text_options(doc_bytes)
     
-    df = pd.DataFrame(df_data)
+    # Create DataFrame with JSON fields to map (cached - it only depends on the schema)
+    df = load_fields_table(schema_bytes)
     
     # Function to render document preview
     def render_document_preview_with_mappings(segments, segment_to_field):
         """Render the Word document with highlighting for mapped sections."""
-        html = """
+        # Each block is marked content-visibility: auto, so the browser skips layout for
+        # blocks scrolled out of view - long documents stay responsive.
+        # Collect the pieces and join them once at the end - growing one string with +=
+        # copies everything built so far for every block
+        html_parts = ["""
         <div style='background: white; padding: 30px; border: 2px solid #ddd; 
                     border-radius: 8px; height: 600px; overflow-y: scroll;
                     font-family: "Calibri", "Arial", sans-serif;'>
-        """
+        """]
         
         for idx, seg in enumerate(segments):
-            text = seg["text"]
-            
             # Check if this segment has a JSON field mapped to it
-            is_mapped = idx in segment_to_field
-            json_field = segment_to_field.get(idx, "")
+            json_field = segment_to_field.get(idx)
             
             # Uniform styling - only difference is green for mapped
-            if is_mapped:
-                bg_color = "#d4edda"
-                border_color = "#28a745"
+            if json_field is not None:
+                bg_color, border_color = "#d4edda", "#28a745"
+                mapped_label = PREVIEW_MAPPED_LABEL_HTML % html.escape(json_field)
             else:
-                bg_color = "#ffffff"
-                border_color = "#e9ecef"
+                bg_color, border_color = "#ffffff", "#e9ecef"
+                mapped_label = ""
             
             # Add type indicator and ID
-            type_emoji = {"heading": "📌", "table_header": "📊", "table_cell": "📋", "paragraph": "📝"}
-            emoji = type_emoji.get(seg["type"], "📝")
-            
-            # Add mapped indicator
-            mapped_label = ""
-            if is_mapped:
-                mapped_label = f'<div style="color: #155724; font-size: 11px; margin-top: 4px;">✓ Will be replaced by: <b>{json_field}</b></div>'
+            emoji = TYPE_EMOJI.get(seg["type"], "📝")
             
-            html += f"""
-            <div style='padding: 12px; margin: 6px 0; background: {bg_color}; 
-                       border-left: 4px solid {border_color}; border-radius: 4px;
-                       font-size: 14px; font-weight: normal;'>
-                <span style='color: #6c757d; font-size: 11px;'>[{idx:03d}] {emoji}</span> {text}
-                {mapped_label}
-            </div>
-            """
+            html_parts.append(PREVIEW_BLOCK_HTML % (
+                bg_color, border_color, idx, emoji, html.escape(seg["text"]), mapped_label
+            ))
         
-        html += "</div>"
-        return html
+        html_parts.append("</div>")
+        return "".join(html_parts)
     
     st.markdown("---")
     
@@ -320,9 +375,9 @@ if doc_file and schema_file:
             key="editor"
         )
         
-        # Update original df with edits
-        for idx in edited_df.index:
-            df.at[idx, "Mapped To"] = edited_df.at[idx, "Mapped To"]
+        # Update original df with edits (a cleared dropdown comes back as NA)
+        df["Mapped To"] = edited_df["Mapped To"].fillna("(Not Mapped)")
+        mapped_rows = df[df["Mapped To"] != "(Not Mapped)"]
         
         # Show progress below the editor
         st.markdown("---")
@@ -341,33 +396,41 @@ if doc_file and schema_file:
         
         # Build a reverse mapping for preview: segment_idx -> json_field (show full path)
         segment_to_field = {}
-        for _, row in df.iterrows():
-            if row["Mapped To"] != "(Not Mapped)":
-                location_info = text_lookup.get(row["Mapped To"])
-                if location_info:
-                    # Remove emoji for display
-                    clean_field = row["JSON Field"].replace(" 📅", "").replace(" 📧", "")
-                    segment_to_field[location_info["index"]] = clean_field
+        for json_field, mapped_to in zip(mapped_rows["JSON Field"], mapped_rows["Mapped To"]):
+            seg_idx = segment_index_from_label(mapped_to, text_options)
+            if seg_idx is not None:
+                # Remove emoji for display
+                clean_field = json_field.replace(" 📅", "").replace(" 📧", "")
+                segment_to_field[seg_idx] = clean_field
         
-        # Render document preview with mappings
-        doc_html = render_document_preview_with_mappings(segments, segment_to_field)
-        st.components.v1.html(doc_html, height=620, scrolling=True)
+        # Render document preview with mappings. The HTML only depends on the document and
+        # the mappings, so reruns that change neither (e.g. the list checkbox below) reuse it
+        preview_key = (hash(doc_bytes), tuple(sorted(segment_to_field.items())))
+        if st.session_state.get("preview_key") != preview_key:
+            st.session_state.preview_html = render_document_preview_with_mappings(segments, segment_to_field)
+            st.session_state.preview_key = preview_key
+        doc_html = st.session_state.preview_html
+        # The preview div sets its own height and scrolling, so it can go straight into the
+        # page instead of a components iframe that has to be booted on every rerun
+        st.html(doc_html)
         
         # Show all text in a list format
+        # Expander contents are built on every rerun even when collapsed, and this is one
+        # element per text block - so only build the list when asked for.
         with st.expander("📋 View All Text (List Format)"):
-            for idx, seg in enumerate(segments):
-                type_emoji = {"heading": "📌", "table_header": "📊", "table_cell": "📋", "paragraph": "📝"}
-                emoji = type_emoji.get(seg["type"], "📝")
-                
-                is_mapped = idx in segment_to_field
-                if is_mapped:
-                    st.success(f"**[{idx:03d}]** {emoji} {seg['text']} → `{segment_to_field[idx]}`")
-                else:
-                    st.text(f"[{idx:03d}] {emoji} {seg['text']}")
+            if st.checkbox("Show all text blocks", key="show_all_text", help="Can be slow for large documents"):
+                for idx, seg in enumerate(segments):
+                    emoji = TYPE_EMOJI.get(seg["type"], "📝")
+                    
+                    is_mapped = idx in segment_to_field
+                    if is_mapped:
+                        st.success(f"**[{idx:03d}]** {emoji} {seg['text']} → `{segment_to_field[idx]}`")
+                    else:
+                        st.text(f"[{idx:03d}] {emoji} {seg['text']}")
     
     # Show mapping summary
     with st.expander("📊 Mapping Summary"):
-        mapped_fields = df[df["Mapped To"] != "(Not Mapped)"][["JSON Field", "Group", "Mapped To"]]
+        mapped_fields = mapped_rows[["JSON Field", "Group", "Mapped To"]]
         if not mapped_fields.empty:
             st.dataframe(mapped_fields, use_container_width=True, hide_index=True)
         else:
@@ -383,27 +446,31 @@ if doc_file and schema_file:
             # Build mapping configuration
             mapping_config = {}
             
-            for _, row in df.iterrows():
-                if row["Mapped To"] != "(Not Mapped)":
-                    json_path = row["Full Path"]
-                    location_info = text_lookup.get(row["Mapped To"])
+            # Only the mapped rows matter - walk their columns together
+            for json_path, json_field, group, field_format, mapped_to in zip(
+                mapped_rows["Full Path"], mapped_rows["JSON Field"], mapped_rows["Group"],
+                mapped_rows["Format"], mapped_rows["Mapped To"]
+            ):
+                seg_idx = segment_index_from_label(mapped_to, text_options)
+                
+                if seg_idx is not None:
+                    seg = segments[seg_idx]
+                    
+                    # Clean path (remove emoji) and extract just the field name
+                    clean_path = json_field.replace(" 📅", "").replace(" 📧", "")
+                    field_name = clean_path.split(".")[-1].replace("[]", "")
                     
-                    if location_info:
-                        # Clean path (remove emoji) and extract just the field name
-                        clean_path = row["JSON Field"].replace(" 📅", "").replace(" 📧", "")
-                        field_name = clean_path.split(".")[-1].replace("[]", "")
-                        
-                        mapping_config[json_path] = {
-                            "field_name": field_name,
-                            "group": row["Group"],
-                            "format": row["Format"] if row["Format"] else None,
-                            "document_location": {
-                                "index": location_info["index"],
-                                "text": location_info["text"],
-                                "type": location_info["type"],
-                                "section": location_info["section"]
-                            }
+                    mapping_config[json_path] = {
+                        "field_name": field_name,
+                        "group": group,
+                        "format": field_format if field_format else None,
+                        "document_location": {
+                            "index": seg_idx,
+                            "text": seg["text"],
+                            "type": seg["type"],
+                            "section": seg["section"]
                         }
+                    }
             
             st.success(f"✅ Mapping configuration created! {len(mapping_config)} fields mapped.")
             st.json(mapping_config)
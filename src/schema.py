@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Literal, Union, Optional, Any
+from typing import Annotated, Literal, Union, Optional, Any
 from pydantic import BaseModel as _BaseModel, Field, model_validator
 from pydantic.json_schema import GenerateJsonSchema
 from enum import Enum
@@ -38,7 +38,9 @@ class DateTimeStep(BaseStep):
 class SubtitleStep(BaseModel):
     step_type: Literal["subtitle"]
 
-Step = Union[StandardStep, DateTimeStep, SubtitleStep]
+# Tagged by step_type, so validation goes straight to the matching variant instead of
+# trying each one in turn
+Step = Annotated[Union[StandardStep, DateTimeStep, SubtitleStep], Field(discriminator="step_type")]
 BaseStep.model_rebuild()
 
 class Section03(BaseModel):
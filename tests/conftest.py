@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The apps import their helpers as top-level modules from src/ (streamlit run src/...)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
@@ -0,0 +1,190 @@
+"""
+iter_text_blocks must give the same blocks, in the same order, as the python-docx walk the
+apps used before document_parser existed - mapping configs refer to blocks by index.
+
+The reference walk below is that original code: Paragraph.text for body paragraphs, and
+Table.rows / row.cells / cell.text for tables, skipping text already seen in the same row.
+"""
+from pathlib import Path
+
+import pytest
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.oxml.table import CT_Tbl
+from docx.oxml.text.paragraph import CT_P
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+from document_parser import iter_text_blocks, table_rows
+
+TEMPLATE = Path(__file__).resolve().parent.parent / "data" / "base_template.docx"
+
+
+def reference_blocks(doc):
+    """The text blocks as the original python-docx walk found them."""
+    blocks = []
+    for child in doc.element.body:
+        if isinstance(child, CT_P):
+            para = Paragraph(child, doc)
+            text = para.text.strip()
+            if text:
+                blocks.append(("paragraph", text, child, para.style.name))
+        elif isinstance(child, CT_Tbl):
+            for row_idx, row in enumerate(Table(child, doc).rows):
+                seen_in_row = set()
+                for cell_idx, cell in enumerate(row.cells):
+                    text = cell.text.strip()
+                    if text and text not in seen_in_row:
+                        seen_in_row.add(text)
+                        p = cell.paragraphs[0]._p if cell.paragraphs else None
+                        blocks.append(("table_cell", text, p, row_idx, cell_idx))
+    return blocks
+
+
+def parsed_blocks(doc):
+    """The text blocks from iter_text_blocks, in the same shape as reference_blocks."""
+    blocks = []
+    for block in iter_text_blocks(doc):
+        if block["type"] == "paragraph":
+            blocks.append(("paragraph", block["text"], block["p"], block["style"]))
+        else:
+            blocks.append(("table_cell", block["text"], block["p"], block["row"], block["col"]))
+    return blocks
+
+
+def assert_same_blocks(doc):
+    expected = reference_blocks(doc)
+    actual = parsed_blocks(doc)
+    assert len(actual) == len(expected)
+    for idx, (got, want) in enumerate(zip(actual, expected)):
+        # Compare the <w:p> targets by identity - an equal-looking paragraph elsewhere in the
+        # document would put the generated text in the wrong place
+        assert got[:2] == want[:2], idx
+        assert got[2] is want[2], idx
+        assert got[3:] == want[3:], idx
+
+
+def tc(text, props=""):
+    """A single-paragraph <w:tc>; props goes into its <w:tcPr>."""
+    run = f"<w:r><w:t>{text}</w:t></w:r>" if text else ""
+    return f"<w:tc><w:tcPr>{props}</w:tcPr><w:p>{run}</w:p></w:tc>"
+
+
+def tr(*cells, grid_before=0):
+    """A <w:tr>, optionally starting with grid_before empty grid columns."""
+    tr_pr = f'<w:trPr><w:gridBefore w:val="{grid_before}"/></w:trPr>' if grid_before else ""
+    return f"<w:tr {nsdecls('w')}>{tr_pr}{''.join(cells)}</w:tr>"
+
+
+def doc_with_table(cols, *rows):
+    """A document holding one table with the given number of grid columns and raw rows."""
+    doc = Document()
+    tbl = doc.add_table(rows=0, cols=cols)._tbl
+    for row in rows:
+        tbl.append(parse_xml(row))
+    return doc
+
+
+SPAN_2 = '<w:gridSpan w:val="2"/>'
+RESTART = '<w:vMerge w:val="restart"/>'
+CONTINUE = "<w:vMerge/>"
+
+
+def test_horizontal_merge():
+    doc = doc_with_table(
+        3,
+        tr(tc("A", SPAN_2), tc("B")),
+        tr(tc("C"), tc("D", SPAN_2)),
+    )
+    assert_same_blocks(doc)
+
+
+def test_vertical_merge():
+    doc = doc_with_table(
+        3,
+        tr(tc("A", RESTART), tc("B"), tc("C")),
+        tr(tc("", CONTINUE), tc("D"), tc("E", RESTART)),
+        tr(tc("", CONTINUE), tc("F"), tc("", CONTINUE)),
+    )
+    assert_same_blocks(doc)
+
+
+def test_vertical_merge_of_a_spanned_cell():
+    doc = doc_with_table(
+        3,
+        tr(tc("A", SPAN_2 + RESTART), tc("B")),
+        tr(tc("", SPAN_2 + CONTINUE), tc("C")),
+    )
+    assert_same_blocks(doc)
+
+
+def test_grid_before():
+    doc = doc_with_table(
+        3,
+        tr(tc("A"), tc("B"), tc("C")),
+        tr(tc("", CONTINUE), tc("D"), grid_before=1),
+        tr(tc("E", SPAN_2), tc("F")),
+        tr(tc("", CONTINUE), grid_before=2),
+        tr(tc("G", SPAN_2), tc("", CONTINUE)),
+    )
+    assert_same_blocks(doc)
+
+
+def test_grid_before_resolves_the_cell_in_the_same_grid_column():
+    doc = doc_with_table(
+        3,
+        tr(tc("A"), tc("B"), tc("C")),
+        tr(tc("", CONTINUE), tc("D"), grid_before=1),
+    )
+    rows = table_rows(doc.tables[0]._tbl)
+    assert rows[1][0] is rows[0][1]
+
+
+def test_repeated_text():
+    doc = doc_with_table(
+        3,
+        tr(tc("same"), tc("same"), tc("other")),
+        tr(tc("same"), tc(""), tc("other")),
+    )
+    assert_same_blocks(doc)
+
+
+def test_run_content():
+    doc = Document()
+    doc.add_heading("Heading", 1)
+    doc.add_paragraph("")
+    doc.add_paragraph("   ")
+    body = doc.element.body
+    paragraphs = [
+        # Tabs, line breaks, page breaks, carriage returns and non-breaking hyphens
+        '<w:r><w:t>a</w:t><w:tab/><w:t>b</w:t><w:br/><w:t>c</w:t></w:r>'
+        '<w:r><w:br w:type="page"/><w:t>d</w:t><w:cr/><w:t>e</w:t><w:noBreakHyphen/><w:t>f</w:t></w:r>',
+        # Text inside a hyperlink
+        '<w:r><w:t xml:space="preserve">see </w:t></w:r>'
+        '<w:hyperlink><w:r><w:t>the link</w:t></w:r></w:hyperlink>'
+        '<w:r><w:t xml:space="preserve"> here</w:t></w:r>',
+        # Surrounding whitespace is stripped
+        '<w:r><w:tab/><w:t xml:space="preserve"> padded </w:t></w:r>',
+    ]
+    for runs in paragraphs:
+        body.insert(len(body) - 1, parse_xml(f"<w:p {nsdecls('w')}>{runs}</w:p>"))
+    doc.add_table(rows=1, cols=1).cell(0, 0).paragraphs[0]._p.append(
+        parse_xml(f"<w:hyperlink {nsdecls('w')}><w:r><w:t>linked cell</w:t></w:r></w:hyperlink>")
+    )
+    assert_same_blocks(doc)
+
+
+def test_multi_paragraph_cell_points_at_its_first_paragraph():
+    doc = Document()
+    cell = doc.add_table(rows=1, cols=1).cell(0, 0)
+    cell.paragraphs[0].text = "first"
+    cell.add_paragraph("second")
+    assert_same_blocks(doc)
+    (block,) = iter_text_blocks(doc)
+    assert block["text"] == "first\nsecond"
+
+
+@pytest.mark.skipif(not TEMPLATE.exists(), reason="bundled template not present")
+def test_bundled_template():
+    assert_same_blocks(Document(str(TEMPLATE)))